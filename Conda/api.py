@@ -1,30 +1,66 @@
-from flask import Flask, jsonify
+"""API Flask para el manejo de roles de usuarios en base de datos Oracle.
+
+Objetos requeridos en el esquema ue21 (ademas de las tablas):
+
+    CREATE SEQUENCE ue21.ue_usuario_roles_seq START WITH <MAX(id) + 1>;
+
+    -- Todas las consultas a ue_usuario_roles filtran por (rol_id, usr_id): con
+    -- este indice son un acceso por B-tree en lugar de un full scan, y ademas
+    -- impide asignar dos veces el mismo rol a un usuario.
+    CREATE UNIQUE INDEX ue21.ux_ue_usuario_roles_rol_usr
+        ON ue21.ue_usuario_roles (rol_id, usr_id);
+
+    -- Colecciones para pasar listas enteras en un solo bind (TABLE(:binds)),
+    -- sin el limite de 1000 elementos de un IN (...) literal.
+    CREATE TYPE ue21.t_str_arr AS TABLE OF VARCHAR2(128);
+    CREATE TYPE ue21.t_num_arr AS TABLE OF NUMBER;
+"""
+from flask import Flask, Response, jsonify, request
+import functools
+import hashlib
+import json
+import logging
 import os
-from typing import Dict, List  
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple  
 import sys
 import oracledb
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
 
-def load_db_config():
-    """Carga configuracion desde variables de entorno."""
-    
-    load_dotenv()
-    
-    
-    config = {
-        'user': os.getenv('DB_USER'),
-        'password': os.getenv('DB_PASSWORD'),
-        'host': os.getenv('DB_HOST'),
-        'port': int(os.getenv('DB_PORT', '1521')),  
-        'sid': os.getenv('DB_SID'),
-        'service': os.getenv('DB_SERVICE')
-    }
+# Maximo de usuarios cuyo ID se mantiene en memoria (LRU: se descarta el menos usado)
+USER_ID_CACHE_MAX = 4096
 
-def load_db_config():
-    """Carga configuracion desde variables de entorno. """
+# Filas que el driver trae por round-trip en las consultas de varias filas
+FETCH_ARRAYSIZE = 1000
+
+# Si todos los IDs de rol son menores a esto se indexan en una lista en lugar del dict
+ROLES_ARRAY_MAX_ID = 10000
+
+# Marca los huecos de la lista de roles (un rol puede tener nombre NULL)
+_NO_ROLE = object()
+
+# Tipos de coleccion del esquema usados para los binds de listas
+STR_ARRAY_TYPE = "UE21.T_STR_ARR"
+NUM_ARRAY_TYPE = "UE21.T_NUM_ARR"
+
+# Maximo de pares usuario x rol que acepta /roles/check por request
+CHECK_MAX_PAIRS = 1000
+
+# Mayor ID de rol que acepta /roles/check (cabe holgado en un NUMBER de Oracle)
+ROLE_ID_MAX = 10**18
+
+def _array_bind(connection, type_name: str, values: list):
+    """Arma una coleccion SQL (ue21.t_str_arr / ue21.t_num_arr) para bindear una lista entera."""
+    return connection.gettype(type_name).newobject(list(values))
+
+@functools.lru_cache(maxsize=1)
+def _read_db_config():
+    """Lee el .env y las variables de entorno una sola vez por proceso."""
     
-    print("--- DEBUG: Iniciando load_db_config ---") # DEBUG
+    logger.debug("Iniciando load_db_config")
     
     try:
         script_dir = os.path.dirname(__file__)
@@ -33,13 +69,13 @@ def load_db_config():
 
     dotenv_path = os.path.join(script_dir, '.env')
     
-    print(f"--- DEBUG: Buscando .env en: {dotenv_path} ---") # DEBUG
+    logger.debug("Buscando .env en: %s", dotenv_path)
     
     
     load_success = load_dotenv(dotenv_path=dotenv_path, encoding='utf-8')
     # --- FIN CORRECCIÓN ---
     
-    print(f"--- DEBUG: ¿Archivo .env cargado con éxito? {load_success} ---") # DEBUG
+    logger.debug("¿Archivo .env cargado con éxito? %s", load_success)
 
     config = {
         'user': os.getenv('DB_USER'),
@@ -49,296 +85,326 @@ def load_db_config():
         'sid': os.getenv('DB_SID'),
     } 
     
-    # DEBUG: Imprimir que variable leyo
-    print(f"--- DEBUG: DB_USER leído: {config['user']} ---")
+    # Que variable leyo
+    logger.debug("DB_USER leído: %s", config['user'])
     
     required_params = ['user', 'password', 'host', 'sid']
     missing_params = [param for param in required_params if not config[param]]
     
     if missing_params:
-        print(f"Error: Faltan variables de entorno: {', '.join([f'DB_{param.upper()}' for param in missing_params])}", file=sys.stderr)
-        print(f"Asegúrate que el archivo '{dotenv_path}' exista (¡sin .txt!), tenga codificación UTF-8 y todas las claves.", file=sys.stderr)
+        logger.error("Faltan variables de entorno: %s", ', '.join([f'DB_{param.upper()}' for param in missing_params]))
+        logger.error("Asegúrate que el archivo '%s' exista (¡sin .txt!), tenga codificación UTF-8 y todas las claves.", dotenv_path)
         sys.exit(1)
         
     return config
 
-def connect_to_db(config: dict):
-    """Establece una conexion con OracleDB."""
+def load_db_config():
+    """Carga configuracion desde variables de entorno. """
+    # Copia para que nadie modifique la config cacheada
+    return dict(_read_db_config())
+
+def build_connect_params(config: dict) -> oracledb.ConnectParams:
+    """Arma los parametros de conexion con OracleDB (una vez, sin makedsn por pool)."""
+    return oracledb.ConnectParams(user=config['user'], password=config['password'],
+                                  host=config['host'], port=config['port'],
+                                  sid=config['sid'])
+
+def create_db_pool(params: oracledb.ConnectParams):
+    """Crea un pool de conexiones con OracleDB."""
     try:
         # oracledb.init_oracle_client() # Descomentar si es necesario
-        dsn = oracledb.makedsn(config['host'], config['port'],
-                               sid=config['sid'])
-        return oracledb.connect(user=config['user'],
-                                password=config['password'], dsn=dsn)
+        # Cada request toma su propia conexion del pool; stmtcachesize evita
+        # re-parsear las consultas que se repiten en cada request
+        return oracledb.create_pool(params=params,
+                                    min=2, max=10, increment=1,
+                                    stmtcachesize=40)
     except oracledb.Error as e:
-        print(f"Error de conexion con la DB: {e}", file=sys.stderr)
+        logger.error("Error de conexion con la DB: %s", e)
         sys.exit(1) # Salir si la conexión falla
 
 class RoleManager:
-    def __init__(self, db_connection):
-        """Inicializa el manager de roles con una conexion a la DB y carga roles"""
-        self.connection = db_connection
+    def __init__(self, db_pool):
+        """Inicializa el manager de roles con un pool de conexiones a la DB y carga roles"""
+        self.pool = db_pool
         self.roles = self.load_roles_from_db()
         self.roles_by_name = {name: id for id, name in self.roles.items()}
+        # self.roles solo cambia al cargar: se ordena una sola vez
+        self._sorted_roles = sorted(self.roles.items())
+        self._roles_arr = self._build_roles_array()
+        # LRU de usuario -> ID; los workers gthread lo comparten entre threads
+        self._user_ids = OrderedDict()
+        self._user_ids_lock = threading.Lock()
+        # Los roles solo se cargan al iniciar: el JSON de /roles y su ETag se arman una vez
+        self.roles_json, self.roles_etag = self._build_roles_payload()
 
     def load_roles_from_db(self) -> Dict[int, str]:
         """Carga los roles desde la DB"""
-        if not self.connection:
+        if not self.pool:
             raise ValueError("Una conexion con la base de datos es requerida.")
 
-        cursor = self.connection.cursor()
         try:
-            cursor.execute("SELECT id, nombre FROM ue21.ue_roles")
-            roles = {row[0]: row[1] for row in cursor.fetchall()}
-            return roles
+            with self.pool.acquire() as connection:
+                with connection.cursor() as cursor:
+                    cursor.arraysize = FETCH_ARRAYSIZE
+                    cursor.prefetchrows = FETCH_ARRAYSIZE
+                    cursor.execute("SELECT id, nombre FROM ue21.ue_roles")
+                    # Iterar el cursor evita materializar la lista intermedia de fetchall()
+                    roles = {row[0]: row[1] for row in cursor}
+                    return roles
         except oracledb.Error as e:
-            print(f"Error cargando roles: {e}", file=sys.stderr)
+            logger.error("Error cargando roles: %s", e)
             return {}
-        finally:
-            cursor.close()
+
+    def _build_roles_array(self):
+        """Lista indexada por ID de rol cuando los IDs son densos; None si conviene quedarse con el dict."""
+        if not self.roles or not all(isinstance(role_id, int) and 0 <= role_id < ROLES_ARRAY_MAX_ID for role_id in self.roles):
+            return None
+
+        roles_arr = [_NO_ROLE] * (max(self.roles) + 1)
+        for role_id, role_name in self.roles.items():
+            roles_arr[role_id] = role_name
+        return roles_arr
 
     def role_exists(self, role_id: int) -> bool:
         """Revisa si un rol id existe en la DB"""
-        return role_id in self.roles
+        roles_arr = self._roles_arr
+        if roles_arr is None:
+            return role_id in self.roles
+        return 0 <= role_id < len(roles_arr) and roles_arr[role_id] is not _NO_ROLE
+
+    def role_name(self, role_id: int) -> str:
+        """Nombre de un rol ('' si no existe)."""
+        roles_arr = self._roles_arr
+        if roles_arr is None:
+            return self.roles.get(role_id, '')
+        if 0 <= role_id < len(roles_arr) and roles_arr[role_id] is not _NO_ROLE:
+            return roles_arr[role_id]
+        return ''
+
+    def _cached_user_id(self, user: str):
+        """ID cacheado de un usuario (None si no esta); lo marca como usado recientemente."""
+        with self._user_ids_lock:
+            user_id = self._user_ids.get(user)
+            if user_id is not None:
+                self._user_ids.move_to_end(user)
+            return user_id
+
+    def _cache_user_id(self, user: str, user_id: int):
+        """Guarda el ID de un usuario, descartando el menos usado si el cache esta lleno."""
+        with self._user_ids_lock:
+            self._user_ids[user] = user_id
+            self._user_ids.move_to_end(user)
+            if len(self._user_ids) > USER_ID_CACHE_MAX:
+                self._user_ids.popitem(last=False)
 
     def get_user_id(self, user: str):
-        """Traer ID de usuario de la DB."""
-        cursor = self.connection.cursor()
+        """Traer ID de usuario de la DB (cacheado en memoria)."""
+        user_id = self._cached_user_id(user)
+        if user_id is not None:
+            return user_id
+
         try:
-            cursor.execute("SELECT ID FROM ue21.ue_usuario WHERE USR_PORTAL = :usr", usr=user)
-            result = cursor.fetchone()
-            return result[0] if result else None
+            with self.pool.acquire() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT ID FROM ue21.ue_usuario WHERE USR_PORTAL = :usr", usr=user)
+                    result = cursor.fetchone()
+                    if not result:
+                        return None
+
+                    # Solo se cachean usuarios existentes: uno inexistente puede crearse despues
+                    self._cache_user_id(user, result[0])
+                    return result[0]
         except oracledb.Error as e:
-            print(f"Error trayendo usuario '{user}': {e}", file=sys.stderr)
+            logger.error("Error trayendo usuario '%s': %s", user, e)
             return None
-        finally:
-            cursor.close()
 
-    def list_all_roles(self):
-        """Muestra todos los roles disponibles."""
+    def _build_roles_payload(self) -> Tuple[bytes, str]:
+        """Arma el JSON ya serializado que devuelve /roles, junto con su ETag."""
         if not self.roles:
-            print("No se encontraron roles en la DB", file=sys.stderr)
-            return
-        
-        print("Roles disponibles:")
-        print("=" * 50)
-        print(f"{'ID':<5} | {'Nombre de Rol'}")
-        print("-" * 50)
-        
-        for role_id, role_name in sorted(self.roles.items()):
-            print(f"{role_id:<5} | {role_name}")
-        
-        print(f"\nTotal de roles: {len(self.roles)}")
+            payload = {"error": "No se encontraron roles"}
+        else:
+            roles_list = [{"id": role_id, "nombre": role_name} for role_id, role_name in self._sorted_roles]
+            payload = {"total": len(roles_list), "roles": roles_list}
+
+        roles_json = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        return roles_json, hashlib.blake2b(roles_json, digest_size=8).hexdigest()
 
     def check_user_role(self, user: str, role_id: int) -> bool:
         """Revisa si un usuario tiene un rol en especifico"""
-        if not self.connection:
+        if not self.pool:
             raise ValueError("Una conexion con la base de datos es requerida")
 
-        cursor = self.connection.cursor()
-        try:
-            user_id = self.get_user_id(user)
-            if not user_id:
-                print(f"Warning: Usuario '{user}' no existente", file=sys.stderr)
-                return False
+        # Chequeo en memoria primero: un rol invalido no llega a tocar la DB
+        if not self.role_exists(role_id):
+            logger.error("ID de Rol %s no existente", role_id)
+            return False
 
-            if not self.role_exists(role_id):
-                print(f"Error: ID de Rol {role_id} no existente", file=sys.stderr)
-                return False
+        # get_user_id toma y libera su propia conexion antes de pedir la nuestra
+        user_id = self.get_user_id(user)
+        if not user_id:
+            logger.warning("Usuario '%s' no existente", user)
+            return False
 
-            cursor.execute(
-                "SELECT 1 FROM ue21.ue_usuario_roles WHERE rol_id = :rol_id AND usr_id = :usr_id",
-                rol_id=role_id, usr_id=user_id
-            )
-            has_role = cursor.fetchone() is not None
+        try:
+            with self.pool.acquire() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT 1 FROM ue21.ue_usuario_roles WHERE rol_id = :rol_id AND usr_id = :usr_id",
+                        rol_id=role_id, usr_id=user_id
+                    )
+                    has_role = cursor.fetchone() is not None
             
-            role_name = self.roles.get(role_id, '')
+            role_name = self.role_name(role_id)
             if has_role:
-                print(f"✓ Usuario '{user}' tiene el rol {role_id} ({role_name})")
+                logger.debug("✓ Usuario '%s' tiene el rol %s (%s)", user, role_id, role_name)
             else:
-                print(f"✗ Usuario '{user}' no tiene el rol {role_id} ({role_name})")
+                logger.debug("✗ Usuario '%s' no tiene el rol %s (%s)", user, role_id, role_name)
             
             return has_role
 
         except oracledb.Error as e:
-            print(f"Error de Oracle al revisar el rol: {e}", file=sys.stderr)
+            logger.error("Error de Oracle al revisar el rol: %s", e)
             return False
 
-        finally:
-            cursor.close()
-
-    def grant_role(self, user: str, role_id: int) -> bool:
-        """Dar rol a un usuario."""
-        if not self.connection:
-            raise ValueError("Una conexion con la base de datos es requerida.")
-
-        cursor = self.connection.cursor()
-        try:
-            user_id = self.get_user_id(user)
-            if not user_id:
-                print(f"Warning: Usuario '{user}' no existente", file=sys.stderr)
-                return False
-
-            if not self.role_exists(role_id):
-                print(f"Error: ID de Rol {role_id} no existente", file=sys.stderr)
-                return False
+    def check_user_roles_bulk(self, users: List[str], role_ids: List[int]) -> Dict[str, Dict[int, bool]]:
+        """Revisa en una sola consulta que roles tiene cada usuario (los errores de Oracle se propagan)."""
+        if not self.pool:
+            raise ValueError("Una conexion con la base de datos es requerida")
 
-            cursor.execute(
-                "SELECT 1 FROM ue21.ue_usuario_roles WHERE rol_id = :rol_id AND usr_id = :usr_id",
-                rol_id=role_id, usr_id=user_id
-            )
-            if cursor.fetchone():
-                print(f"Info: Usuario '{user}' ya tiene el rol {role_id} ({self.roles.get(role_id, '')})")
-                return True
+        result = {user: {role_id: False for role_id in role_ids} for user in users}
 
-            cursor.execute("SELECT MAX(ID) + 1 FROM ue21.UE_USUARIO_ROLES")
-            max_id_result = cursor.fetchone()
-            new_id = max_id_result[0] if max_id_result[0] is not None else 1  
-
-            cursor.execute(
-                "INSERT INTO ue21.ue_usuario_roles (id, rol_id, usr_id) VALUES (:id, :rol_id, :usr_id)",
-                id=new_id, rol_id=role_id, usr_id=user_id
-            )
-            self.connection.commit()
-            print(f"Success: Se concedio el rol {role_id} ({self.roles.get(role_id, '')}) al usuario '{user}'")
-            return True
-
-        except oracledb.IntegrityError as e:
-            if 'ORA-02291' in str(e):
-                print(f"Error: ID de Rol {role_id} no existente (violacion de FK)", file=sys.stderr)
+        valid_roles = []
+        for role_id in role_ids:
+            if self.role_exists(role_id):
+                valid_roles.append(role_id)
             else:
-                print(f"Error de integridad de Oracle: {e}", file=sys.stderr)
-            self.connection.rollback()
-            return False
+                logger.error("ID de Rol %s no existente", role_id)
 
-        except oracledb.Error as e:
-            print(f"Error de Oracle: {e}", file=sys.stderr)
-            self.connection.rollback()
-            return False
-
-        finally:
-            cursor.close()
-
-def list_all_roles(self):
-    """Muestra todos los roles disponibles."""
-    if not self.roles:
-        return {"error": "No se encontraron roles"} # Que devuelva esto
-
-    roles_list = []
-    for role_id, role_name in sorted(self.roles.items()):
-        roles_list.append({"id": role_id, "nombre": role_name})
-
-    # Que devuelva esto (un diccionario) en lugar de usar 'print'
-    return {"total": len(roles_list), "roles": roles_list}
+        if not users or not valid_roles:
+            return result
 
-    def check_user_role(self, user: str, role_id: int) -> bool:
-        """Revisa si un usuario tiene un rol en especifico"""
-        if not self.connection:
-            raise ValueError("Una conexion con la base de datos es requerida")
+        # Usuarios y roles viajan como colecciones: un solo round-trip y sin limite de tamaño del IN
+        sql = (
+            "SELECT u.usr_portal, ur.rol_id FROM ue21.ue_usuario u "
+            "LEFT JOIN ue21.ue_usuario_roles ur ON ur.usr_id = u.id "
+            "AND ur.rol_id IN (SELECT column_value FROM TABLE(:roles)) "
+            "WHERE u.usr_portal IN (SELECT column_value FROM TABLE(:users))"
+        )
 
-        cursor = self.connection.cursor()
         try:
-            user_id = self.get_user_id(user)
-            if not user_id:
-                print(f"Warning: Usuario '{user}' no existente", file=sys.stderr)
-                return False
+            with self.pool.acquire() as connection:
+                with connection.cursor() as cursor:
+                    cursor.arraysize = FETCH_ARRAYSIZE
+                    cursor.execute(sql, users=_array_bind(connection, STR_ARRAY_TYPE, users),
+                                   roles=_array_bind(connection, NUM_ARRAY_TYPE, valid_roles))
+                    found_users = set()
+                    granted = set()
+                    for usr_portal, rol_id in cursor:
+                        found_users.add(usr_portal)
+                        if rol_id is not None:
+                            granted.add((usr_portal, rol_id))
 
-            if not self.role_exists(role_id):
-                print(f"Error: ID de Rol {role_id} no existente", file=sys.stderr)
-                return False
+        except oracledb.Error as e:
+            # Se propaga: una falla de la DB no puede verse como "nadie tiene ningun rol"
+            logger.error("Error de Oracle al revisar los roles: %s", e)
+            raise
 
-            cursor.execute(
-                "SELECT 1 FROM ue21.ue_usuario_roles WHERE rol_id = :rol_id AND usr_id = :usr_id",
-                rol_id=role_id, usr_id=user_id
-            )
-            has_role = cursor.fetchone() is not None
-            
-            role_name = self.roles.get(role_id, '')
-            if has_role:
-                print(f"✓ Usuario '{user}' tiene el rol {role_id} ({role_name})")
-            else:
-                print(f"✗ Usuario '{user}' no tiene el rol {role_id} ({role_name})")
-            
-            return has_role
+        for user in users:
+            if user not in found_users:
+                logger.warning("Usuario '%s' no existente", user)
+                continue
 
-        except oracledb.Error as e:
-            print(f"Error de Oracle al revisar el rol: {e}", file=sys.stderr)
-            return False
+            for role_id in valid_roles:
+                has_role = (user, role_id) in granted
+                result[user][role_id] = has_role
+
+                role_name = self.role_name(role_id)
+                if has_role:
+                    logger.debug("✓ Usuario '%s' tiene el rol %s (%s)", user, role_id, role_name)
+                else:
+                    logger.debug("✗ Usuario '%s' no tiene el rol %s (%s)", user, role_id, role_name)
 
-        finally:
-            cursor.close()
+        return result
 
     def grant_role(self, user: str, role_id: int) -> bool:
         """Dar rol a un usuario."""
-        if not self.connection:
+        if not self.pool:
             raise ValueError("Una conexion con la base de datos es requerida.")
 
-        cursor = self.connection.cursor()
-        try:
-            user_id = self.get_user_id(user)
-            if not user_id:
-                print(f"Warning: Usuario '{user}' no existente", file=sys.stderr)
-                return False
+        # Chequeo en memoria primero: un rol invalido no llega a tocar la DB
+        if not self.role_exists(role_id):
+            logger.error("ID de Rol %s no existente", role_id)
+            return False
 
-            if not self.role_exists(role_id):
-                print(f"Error: ID de Rol {role_id} no existente", file=sys.stderr)
-                return False
+        # get_user_id toma y libera su propia conexion antes de pedir la nuestra
+        user_id = self.get_user_id(user)
+        if not user_id:
+            logger.warning("Usuario '%s' no existente", user)
+            return False
 
-            cursor.execute(
-                "SELECT 1 FROM ue21.ue_usuario_roles WHERE rol_id = :rol_id AND usr_id = :usr_id",
-                rol_id=role_id, usr_id=user_id
-            )
-            if cursor.fetchone():
-                print(f"Info: Usuario '{user}' ya tiene el rol {role_id} ({self.roles.get(role_id, '')})")
+        with self.pool.acquire() as connection:
+            try:
+                with connection.cursor() as cursor:
+                    # Chequeo de existencia e INSERT en una sola sentencia: un round-trip y sin
+                    # hueco entre el SELECT y el INSERT. El ID sale de la secuencia (sin MAX(ID) + 1)
+                    cursor.execute(
+                        "MERGE INTO ue21.ue_usuario_roles t "
+                        "USING (SELECT :rol_id AS rol_id, :usr_id AS usr_id FROM dual) s "
+                        "ON (t.rol_id = s.rol_id AND t.usr_id = s.usr_id) "
+                        "WHEN NOT MATCHED THEN INSERT (id, rol_id, usr_id) "
+                        "VALUES (ue21.ue_usuario_roles_seq.NEXTVAL, s.rol_id, s.usr_id)",
+                        rol_id=role_id, usr_id=user_id
+                    )
+                    if cursor.rowcount == 0:
+                        logger.info("Usuario '%s' ya tiene el rol %s (%s)", user, role_id, self.role_name(role_id))
+                        return True
+                connection.commit()
+                logger.info("Se concedio el rol %s (%s) al usuario '%s'", role_id, self.role_name(role_id), user)
                 return True
 
-           
-            cursor.execute("SELECT MAX(ID) + 1 FROM ue21.UE_USUARIO_ROLES")
-            max_id_result = cursor.fetchone()
-            new_id = max_id_result[0] if max_id_result[0] is not None else 1  
-
-            cursor.execute(
-                "INSERT INTO ue21.ue_usuario_roles (id, rol_id, usr_id) VALUES (:id, :rol_id, :usr_id)",
-                id=new_id, rol_id=role_id, usr_id=user_id
-            )
-            self.connection.commit()
-            print(f"Success: Se concedio el rol {role_id} ({self.roles.get(role_id, '')}) al usuario '{user}'")
-            return True
-
-        except oracledb.IntegrityError as e:
-            if 'ORA-02291' in str(e):
-                print(f"Error: ID de Rol {role_id} no existente (violacion de FK)", file=sys.stderr)
-            else:
-                print(f"Error de integridad de Oracle: {e}", file=sys.stderr)
-            self.connection.rollback()
-            return False
+            except oracledb.IntegrityError as e:
+                if 'ORA-00001' in str(e):
+                    # Otro request concedio el mismo par entre el ON y el INSERT del MERGE
+                    logger.info("Usuario '%s' ya tiene el rol %s (%s)", user, role_id, self.role_name(role_id))
+                    return True
+                if 'ORA-02291' in str(e):
+                    logger.error("ID de Rol %s no existente (violacion de FK)", role_id)
+                else:
+                    logger.error("Error de integridad de Oracle: %s", e)
+                connection.rollback()
+                return False
 
-        except oracledb.Error as e:
-            print(f"Error de Oracle: {e}", file=sys.stderr)
-            self.connection.rollback()
-            return False
+            except oracledb.Error as e:
+                logger.error("Error de Oracle: %s", e)
+                connection.rollback()
+                return False
 
-        finally:
-            cursor.close()
 
 # --- Configuración de Flask 
+logging.basicConfig(level=logging.INFO)
 app = Flask(__name__)
 
-# Conexión Global a la DB (Esto se ejecuta 1 vez) 
+# Pool Global de conexiones a la DB (Esto se ejecuta 1 vez) 
 role_manager = None # Inicializa en None
 try:
-    db_config = load_db_config()
-    connection = connect_to_db(db_config)
+    db_params = build_connect_params(load_db_config())
+    pool = create_db_pool(db_params)
 
-    if connection:
+    if pool:
         # Creo la instancia de tu clase
-        role_manager = RoleManager(db_connection=connection)
-        print("¡Conexión a Oracle DB exitosa!")
+        role_manager = RoleManager(db_pool=pool)
+        logger.info("¡Conexión a Oracle DB exitosa!")
     else:
-        print("ERROR: No se pudo conectar a la base de datos.", file=sys.stderr)
+        logger.error("No se pudo conectar a la base de datos.")
 
 except Exception as e:
-    print(f"Error fatal al inicializar la app: {e}", file=sys.stderr)
+    logger.error("Error fatal al inicializar la app: %s", e)
+
+
+def reset_db_pool():
+    """Crea un pool nuevo para el proceso actual (los workers de gunicorn no heredan conexiones del master)."""
+    if role_manager:
+        role_manager.pool = create_db_pool(db_params)
 
 
 # --- Definición de Endpoints (Las puertas de la API) ---
@@ -356,15 +422,78 @@ def get_all_roles():
     if not role_manager:
         return jsonify({"error": "El servidor no pudo conectarse a la base de datos"}), 500
     try:
-        # Llamo al método modificado de la clase
-        roles_data = role_manager.list_all_roles()
+        # El JSON ya viene armado desde que se cargaron los roles; si el cliente
+        # manda el mismo ETag (If-None-Match) make_conditional responde 304 sin cuerpo
+        response = Response(role_manager.roles_json, mimetype='application/json')
+        response.set_etag(role_manager.roles_etag)
+        response.cache_control.max_age = 60
+        return response.make_conditional(request)
+
+    except Exception as e:
+        return jsonify({"error": f"Ocurrió un error: {str(e)}"}), 500
 
-        # Flask convierte este diccionario de Python en JSON
-        return jsonify(roles_data)
+def _is_role_id(value) -> bool:
+    """Un ID de rol valido es un int (no bool) o un string de digitos, de 0 a ROLE_ID_MAX; '' se acepta y luego se descarta."""
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return 0 <= value <= ROLE_ID_MAX
+    if not isinstance(value, str):
+        return False
+    value = value.strip()
+    if not value:
+        return True
+    # El largo se revisa antes de int() para no convertir strings enormes
+    return (len(value) <= len(str(ROLE_ID_MAX)) and value.isascii() and value.isdigit()
+            and int(value) <= ROLE_ID_MAX)
+
+@app.route("/roles/check", methods=["GET", "POST"])
+def check_roles():
+    """
+    El front-end llamará a http://127.0.0.1:5000/roles/check?users=u1,u2&roles=1,2
+    o con POST y body {"users": [...], "roles": [...]} (p.ej. para una tabla entera).
+    Devuelve {"usuario": {"rol_id": true/false}}, hasta CHECK_MAX_PAIRS pares por request.
+    """
+    if not role_manager:
+        return jsonify({"error": "El servidor no pudo conectarse a la base de datos"}), 500
+
+    if request.method == "POST":
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or not isinstance(body.get("users"), list) or not isinstance(body.get("roles"), list):
+            return jsonify({"error": "El body debe ser JSON con las listas 'users' y 'roles'"}), 400
+        users_in, roles_in = body["users"], body["roles"]
+    else:
+        users_arg = request.args.get("users", "")
+        roles_arg = request.args.get("roles", "")
+        if not users_arg or not roles_arg:
+            return jsonify({"error": "Los parametros 'users' y 'roles' son requeridos"}), 400
+        users_in, roles_in = users_arg.split(','), roles_arg.split(',')
+
+    if not all(isinstance(user, str) for user in users_in):
+        return jsonify({"error": "Los usuarios deben ser texto"}), 400
+    if not all(_is_role_id(role_id) for role_id in roles_in):
+        return jsonify({"error": "Los IDs de rol deben ser numericos"}), 400
+
+    # Se descartan los valores vacios (p.ej. "a,,b") antes de quitar repetidos
+    users = list(dict.fromkeys(user.strip() for user in users_in if user.strip()))
+    roles = list(dict.fromkeys(int(role_id) for role_id in roles_in
+                               if not (isinstance(role_id, str) and not role_id.strip())))
+
+    if not users or not roles:
+        return jsonify({"error": "Los parametros 'users' y 'roles' son requeridos"}), 400
+
+    # Tope de la matriz para acotar la memoria de la respuesta
+    if len(users) * len(roles) > CHECK_MAX_PAIRS:
+        return jsonify({"error": f"Maximo {CHECK_MAX_PAIRS} pares usuario x rol por request"}), 413
+
+    try:
+        # Una sola consulta para toda la matriz usuario x rol
+        return jsonify(role_manager.check_user_roles_bulk(users, roles))
 
     except Exception as e:
         return jsonify({"error": f"Ocurrió un error: {str(e)}"}), 500
 
-# Punto de entrada para ejecutar el servidor 
+# Punto de entrada para ejecutar el servidor de desarrollo (en produccion: gunicorn, ver gunicorn.conf.py)
 if __name__ == "__main__":
-    app.run(debug=True)
+    # Sin reloader: cada recarga volvia a leer el .env y a conectarse a Oracle
+    app.run(debug=True, use_reloader=False)
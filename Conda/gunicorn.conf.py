@@ -0,0 +1,28 @@
+"""Configuracion de gunicorn para la API.
+
+Ejecutar desde la carpeta Conda:
+
+    gunicorn -c gunicorn.conf.py
+"""
+wsgi_app = "api:app"
+
+workers = 4
+worker_class = "gthread"
+threads = 8
+
+# El master importa api.py una sola vez: el .env y los roles se cargan ahi y
+# los workers los comparten via fork (copy-on-write)
+preload_app = True
+
+
+def when_ready(server):
+    # Las conexiones del master no pueden compartirse entre procesos
+    import api
+    if api.role_manager:
+        api.role_manager.pool.close(force=True)
+
+
+def post_fork(server, worker):
+    # Cada worker abre su propio pool
+    import api
+    api.reset_db_pool()
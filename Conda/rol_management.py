@@ -1,49 +1,183 @@
+"""Manejo de roles de usuarios en base de datos Oracle.
+
+Objetos requeridos en el esquema ue21 (ademas de las tablas):
+
+    CREATE SEQUENCE ue21.ue_usuario_roles_seq START WITH <MAX(id) + 1>;
+
+    -- Todas las consultas a ue_usuario_roles filtran por (rol_id, usr_id): con
+    -- este indice son un acceso por B-tree en lugar de un full scan, y ademas
+    -- impide asignar dos veces el mismo rol a un usuario.
+    CREATE UNIQUE INDEX ue21.ux_ue_usuario_roles_rol_usr
+        ON ue21.ue_usuario_roles (rol_id, usr_id);
+
+    -- Colecciones para pasar listas enteras en un solo bind (TABLE(:binds)),
+    -- sin el limite de 1000 elementos de un IN (...) literal.
+    CREATE TYPE ue21.t_str_arr AS TABLE OF VARCHAR2(128);
+    CREATE TYPE ue21.t_num_arr AS TABLE OF NUMBER;
+"""
 import argparse
+import functools
 import sys
 import os
 import oracledb
+from collections import OrderedDict
 from typing import List, Dict
 from dotenv import load_dotenv
 
+# Maximo de usuarios cuyo ID se mantiene en memoria (LRU: se descarta el menos usado)
+USER_ID_CACHE_MAX = 4096
+
+# Filas que el driver trae por round-trip en las consultas de varias filas
+FETCH_ARRAYSIZE = 1000
+
+# Si todos los IDs de rol son menores a esto se indexan en una lista en lugar del dict
+ROLES_ARRAY_MAX_ID = 10000
+
+# Marca los huecos de la lista de roles (un rol puede tener nombre NULL)
+_NO_ROLE = object()
+
+# Tipos de coleccion del esquema usados para los binds de listas
+STR_ARRAY_TYPE = "UE21.T_STR_ARR"
+NUM_ARRAY_TYPE = "UE21.T_NUM_ARR"
+
+def _array_bind(connection, type_name: str, values: list):
+    """Arma una coleccion SQL (ue21.t_str_arr / ue21.t_num_arr) para bindear una lista entera."""
+    return connection.gettype(type_name).newobject(list(values))
+
+
 class RoleManager:
     def __init__(self, db_connection):
         """Inicializa el manager de roles con una conexion a la DB y carga roles"""
         self.connection = db_connection
         self.roles = self.load_roles_from_db()
         self.roles_by_name = {name: id for id, name in self.roles.items()}
+        # self.roles solo cambia al cargar: se ordena una sola vez
+        self._sorted_roles = sorted(self.roles.items())
+        self._roles_arr = self._build_roles_array()
+        # LRU de usuario -> ID
+        self._user_ids = OrderedDict()
+        # Grants hechos con commit=False: se informan recien cuando flush() confirma
+        self._pending_grants = []
 
     def load_roles_from_db(self) -> Dict[int, str]:
         """Carga los roles desde la DB"""
         if not self.connection:
             raise ValueError("Una conexion con la base de datos es requerida.")
 
-        cursor = self.connection.cursor()
         try:
-            cursor.execute("SELECT id, nombre FROM ue21.ue_roles")
-            roles = {row[0]: row[1] for row in cursor.fetchall()}
-            return roles
+            with self.connection.cursor() as cursor:
+                cursor.arraysize = FETCH_ARRAYSIZE
+                cursor.prefetchrows = FETCH_ARRAYSIZE
+                cursor.execute("SELECT id, nombre FROM ue21.ue_roles")
+                # Iterar el cursor evita materializar la lista intermedia de fetchall()
+                roles = {row[0]: row[1] for row in cursor}
+                return roles
         except oracledb.Error as e:
             print(f"Error cargando roles: {e}", file=sys.stderr)
             return {}
-        finally:
-            cursor.close()
+
+    def _build_roles_array(self):
+        """Lista indexada por ID de rol cuando los IDs son densos; None si conviene quedarse con el dict."""
+        if not self.roles or not all(isinstance(role_id, int) and 0 <= role_id < ROLES_ARRAY_MAX_ID for role_id in self.roles):
+            return None
+
+        roles_arr = [_NO_ROLE] * (max(self.roles) + 1)
+        for role_id, role_name in self.roles.items():
+            roles_arr[role_id] = role_name
+        return roles_arr
 
     def role_exists(self, role_id: int) -> bool:
         """Revisa si un rol id existe en la DB"""
-        return role_id in self.roles
+        roles_arr = self._roles_arr
+        if roles_arr is None:
+            return role_id in self.roles
+        return 0 <= role_id < len(roles_arr) and roles_arr[role_id] is not _NO_ROLE
+
+    def role_name(self, role_id: int) -> str:
+        """Nombre de un rol ('' si no existe)."""
+        roles_arr = self._roles_arr
+        if roles_arr is None:
+            return self.roles.get(role_id, '')
+        if 0 <= role_id < len(roles_arr) and roles_arr[role_id] is not _NO_ROLE:
+            return roles_arr[role_id]
+        return ''
+
+    def _cached_user_id(self, user: str):
+        """ID cacheado de un usuario (None si no esta); lo marca como usado recientemente."""
+        user_id = self._user_ids.get(user)
+        if user_id is not None:
+            self._user_ids.move_to_end(user)
+        return user_id
+
+    def _cache_user_id(self, user: str, user_id: int):
+        """Guarda el ID de un usuario, descartando el menos usado si el cache esta lleno."""
+        self._user_ids[user] = user_id
+        self._user_ids.move_to_end(user)
+        if len(self._user_ids) > USER_ID_CACHE_MAX:
+            self._user_ids.popitem(last=False)
 
     def get_user_id(self, user: str):
-        """Traer ID de usuario de la DB."""
-        cursor = self.connection.cursor()
+        """Traer ID de usuario de la DB (cacheado en memoria)."""
+        user_id = self._cached_user_id(user)
+        if user_id is not None:
+            return user_id
+
         try:
-            cursor.execute("SELECT ID FROM ue21.ue_usuario WHERE USR_PORTAL = :usr", usr=user)
-            result = cursor.fetchone()
-            return result[0] if result else None
+            with self.connection.cursor() as cursor:
+                cursor.execute("SELECT ID FROM ue21.ue_usuario WHERE USR_PORTAL = :usr", usr=user)
+                result = cursor.fetchone()
+                if not result:
+                    return None
+
+                # Solo se cachean usuarios existentes: uno inexistente puede crearse despues
+                self._cache_user_id(user, result[0])
+                return result[0]
         except oracledb.Error as e:
             print(f"Error trayendo usuario '{user}': {e}", file=sys.stderr)
             return None
-        finally:
-            cursor.close()
+
+    def get_user_ids(self, users: List[str]) -> Dict[str, int]:
+        """Traer IDs de varios usuarios en una sola consulta (usa el cache de get_user_id)."""
+        user_ids = {}
+        missing = []
+        for user in users:
+            user_id = self._cached_user_id(user)
+            if user_id is None:
+                missing.append(user)
+            else:
+                user_ids[user] = user_id
+        if not missing:
+            return user_ids
+
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT USR_PORTAL, ID FROM ue21.ue_usuario WHERE USR_PORTAL IN (SELECT column_value FROM TABLE(:users))",
+                    users=_array_bind(self.connection, STR_ARRAY_TYPE, missing)
+                )
+                for usr_portal, usr_id in cursor:
+                    user_ids[usr_portal] = usr_id
+                    self._cache_user_id(usr_portal, usr_id)
+        except oracledb.Error as e:
+            print(f"Error trayendo usuarios: {e}", file=sys.stderr)
+
+        return user_ids
+
+    def _report_grant(self, user: str, role_id: int):
+        """Informa un grant ya confirmado en la DB."""
+        print(f"Success: Se concedio el rol {role_id} ({self.role_name(role_id)}) al usuario '{user}'")
+
+    def flush(self):
+        """Confirma los grants pendientes hechos con commit=False y recien ahi los informa."""
+        self.connection.commit()
+        pending, self._pending_grants = self._pending_grants, []
+        for user, role_id in pending:
+            self._report_grant(user, role_id)
+
+    def rollback(self):
+        """Descarta los grants pendientes hechos con commit=False."""
+        self._pending_grants = []
+        self.connection.rollback()
 
     def list_all_roles(self):
         """Muestra todos los roles disponibles."""
@@ -56,7 +190,7 @@ class RoleManager:
         print(f"{'ID':<5} | {'Nombre de Rol'}")
         print("-" * 50)
         
-        for role_id, role_name in sorted(self.roles.items()):
+        for role_id, role_name in self._sorted_roles:
             print(f"{role_id:<5} | {role_name}")
         
         print(f"\nTotal de roles: {len(self.roles)}")
@@ -66,94 +200,251 @@ class RoleManager:
         if not self.connection:
             raise ValueError("Una conexion con la base de datos es requerida")
 
-        cursor = self.connection.cursor()
-        try:
-            user_id = self.get_user_id(user)
-            if not user_id:
-                print(f"Warning: Usuario '{user}' no existente", file=sys.stderr)
-                return False
+        # Chequeo en memoria primero: un rol invalido no llega a tocar la DB
+        if not self.role_exists(role_id):
+            print(f"Error: ID de Rol {role_id} no existente", file=sys.stderr)
+            return False
 
-            if not self.role_exists(role_id):
-                print(f"Error: ID de Rol {role_id} no existente", file=sys.stderr)
-                return False
+        user_id = self.get_user_id(user)
+        if not user_id:
+            print(f"Warning: Usuario '{user}' no existente", file=sys.stderr)
+            return False
 
-            cursor.execute(
-                "SELECT 1 FROM ue21.ue_usuario_roles WHERE rol_id = :rol_id AND usr_id = :usr_id",
-                rol_id=role_id, usr_id=user_id
-            )
-            has_role = cursor.fetchone() is not None
-            
-            role_name = self.roles.get(role_id, '')
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM ue21.ue_usuario_roles WHERE rol_id = :rol_id AND usr_id = :usr_id",
+                    rol_id=role_id, usr_id=user_id
+                )
+                has_role = cursor.fetchone() is not None
+
+            role_name = self.role_name(role_id)
             if has_role:
                 print(f"✓ Usuario '{user}' tiene el rol {role_id} ({role_name})")
             else:
                 print(f"✗ Usuario '{user}' no tiene el rol {role_id} ({role_name})")
-            
+
             return has_role
 
         except oracledb.Error as e:
             print(f"Error de Oracle al revisar el rol: {e}", file=sys.stderr)
             return False
 
-        finally:
-            cursor.close()
-
-    def grant_role(self, user: str, role_id: int) -> bool:
-        """Dar rol a un usuario."""
+    def check_user_roles_bulk(self, users: List[str], role_ids: List[int]) -> Dict[str, Dict[int, bool]]:
+        """Revisa en una sola consulta que roles tiene cada usuario"""
         if not self.connection:
-            raise ValueError("Una conexion con la base de datos es requerida.")
+            raise ValueError("Una conexion con la base de datos es requerida")
+
+        result = {user: {role_id: False for role_id in role_ids} for user in users}
+
+        valid_roles = []
+        for role_id in role_ids:
+            if self.role_exists(role_id):
+                valid_roles.append(role_id)
+            else:
+                print(f"Error: ID de Rol {role_id} no existente", file=sys.stderr)
+
+        if not users or not valid_roles:
+            return result
+
+        # Usuarios y roles viajan como colecciones: un solo round-trip y sin limite de tamaño del IN
+        sql = (
+            "SELECT u.usr_portal, ur.rol_id FROM ue21.ue_usuario u "
+            "LEFT JOIN ue21.ue_usuario_roles ur ON ur.usr_id = u.id "
+            "AND ur.rol_id IN (SELECT column_value FROM TABLE(:roles)) "
+            "WHERE u.usr_portal IN (SELECT column_value FROM TABLE(:users))"
+        )
 
-        cursor = self.connection.cursor()
         try:
-            user_id = self.get_user_id(user)
-            if not user_id:
+            with self.connection.cursor() as cursor:
+                cursor.arraysize = FETCH_ARRAYSIZE
+                cursor.execute(sql, users=_array_bind(self.connection, STR_ARRAY_TYPE, users),
+                               roles=_array_bind(self.connection, NUM_ARRAY_TYPE, valid_roles))
+                found_users = set()
+                granted = set()
+                for usr_portal, rol_id in cursor:
+                    found_users.add(usr_portal)
+                    if rol_id is not None:
+                        granted.add((usr_portal, rol_id))
+
+        except oracledb.Error as e:
+            print(f"Error de Oracle al revisar los roles: {e}", file=sys.stderr)
+            return result
+
+        for user in users:
+            if user not in found_users:
                 print(f"Warning: Usuario '{user}' no existente", file=sys.stderr)
-                return False
+                continue
 
-            if not self.role_exists(role_id):
-                print(f"Error: ID de Rol {role_id} no existente", file=sys.stderr)
-                return False
-
-            cursor.execute(
-                "SELECT 1 FROM ue21.ue_usuario_roles WHERE rol_id = :rol_id AND usr_id = :usr_id",
-                rol_id=role_id, usr_id=user_id
-            )
-            if cursor.fetchone():
-                print(f"Info: Usuario '{user}' ya tiene el rol {role_id} ({self.roles.get(role_id, '')})")
-                return True
+            for role_id in valid_roles:
+                has_role = (user, role_id) in granted
+                result[user][role_id] = has_role
+
+                role_name = self.role_name(role_id)
+                if has_role:
+                    print(f"✓ Usuario '{user}' tiene el rol {role_id} ({role_name})")
+                else:
+                    print(f"✗ Usuario '{user}' no tiene el rol {role_id} ({role_name})")
+
+        return result
+
+    def grant_role(self, user: str, role_id: int, commit: bool = True) -> bool:
+        """Dar rol a un usuario. Con commit=False el commit queda para flush() y los errores de Oracle se propagan."""
+        if not self.connection:
+            raise ValueError("Una conexion con la base de datos es requerida.")
+
+        # Chequeo en memoria primero: un rol invalido no llega a tocar la DB
+        if not self.role_exists(role_id):
+            print(f"Error: ID de Rol {role_id} no existente", file=sys.stderr)
+            return False
 
-            # Get the next available ID for new role assignment
-            cursor.execute("SELECT MAX(ID) + 1 FROM ue21.UE_USUARIO_ROLES")
-            max_id_result = cursor.fetchone()
-            new_id = max_id_result[0] if max_id_result[0] is not None else 1  # If no records, start from 1
+        user_id = self.get_user_id(user)
+        if not user_id:
+            print(f"Warning: Usuario '{user}' no existente", file=sys.stderr)
+            return False
 
-            cursor.execute(
-                "INSERT INTO ue21.ue_usuario_roles (id, rol_id, usr_id) VALUES (:id, :rol_id, :usr_id)",
-                id=new_id, rol_id=role_id, usr_id=user_id
-            )
-            self.connection.commit()
-            print(f"Success: Se concedio el rol {role_id} ({self.roles.get(role_id, '')}) al usuario '{user}'")
-            return True
+        try:
+            with self.connection.cursor() as cursor:
+                # Chequeo de existencia e INSERT en una sola sentencia: un round-trip y sin
+                # hueco entre el SELECT y el INSERT. El ID sale de la secuencia (sin MAX(ID) + 1)
+                cursor.execute(
+                    "MERGE INTO ue21.ue_usuario_roles t "
+                    "USING (SELECT :rol_id AS rol_id, :usr_id AS usr_id FROM dual) s "
+                    "ON (t.rol_id = s.rol_id AND t.usr_id = s.usr_id) "
+                    "WHEN NOT MATCHED THEN INSERT (id, rol_id, usr_id) "
+                    "VALUES (ue21.ue_usuario_roles_seq.NEXTVAL, s.rol_id, s.usr_id)",
+                    rol_id=role_id, usr_id=user_id
+                )
+                if cursor.rowcount == 0:
+                    print(f"Info: Usuario '{user}' ya tiene el rol {role_id} ({self.role_name(role_id)})")
+                    return True
+                if commit:
+                    self.connection.commit()
+                    self._report_grant(user, role_id)
+                else:
+                    self._pending_grants.append((user, role_id))
+                return True
 
         except oracledb.IntegrityError as e:
+            if 'ORA-00001' in str(e):
+                # Otra sesion concedio el mismo par entre el ON y el INSERT del MERGE;
+                # solo se deshizo esta sentencia, el resto del lote queda intacto
+                print(f"Info: Usuario '{user}' ya tiene el rol {role_id} ({self.role_name(role_id)})")
+                return True
             if 'ORA-02291' in str(e):
                 print(f"Error: ID de Rol {role_id} no existente (violacion de FK)", file=sys.stderr)
             else:
                 print(f"Error de integridad de Oracle: {e}", file=sys.stderr)
-            self.connection.rollback()
+            # Oracle ya deshizo la sentencia fallida; sin commit propio no se toca el resto del lote
+            if commit:
+                self.connection.rollback()
             return False
 
         except oracledb.Error as e:
+            # Con commit=False la transaccion es del llamador: que la deshaga entera
+            if not commit:
+                raise
             print(f"Error de Oracle: {e}", file=sys.stderr)
             self.connection.rollback()
             return False
 
-        finally:
-            cursor.close()
+    def grant_roles_bulk(self, users: List[str], role_ids: List[int], commit: bool = True) -> Dict[str, Dict[int, bool]]:
+        """Dar varios roles a varios usuarios en un solo lote. Con commit=False el commit queda para flush() y los errores de Oracle se propagan."""
+        if not self.connection:
+            raise ValueError("Una conexion con la base de datos es requerida.")
 
+        result = {user: {role_id: False for role_id in role_ids} for user in users}
 
-def load_db_config():
-    """Carga configuracion desde variables de entorno."""
+        valid_roles = []
+        for role_id in role_ids:
+            if self.role_exists(role_id):
+                valid_roles.append(role_id)
+            else:
+                print(f"Error: ID de Rol {role_id} no existente", file=sys.stderr)
+
+        user_ids = self.get_user_ids(users) if users else {}
+        for user in users:
+            if user not in user_ids:
+                print(f"Warning: Usuario '{user}' no existente", file=sys.stderr)
+
+        if not user_ids or not valid_roles:
+            return result
+
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.arraysize = FETCH_ARRAYSIZE
+                cursor.execute(
+                    "SELECT usr_id, rol_id FROM ue21.ue_usuario_roles "
+                    "WHERE usr_id IN (SELECT column_value FROM TABLE(:users)) "
+                    "AND rol_id IN (SELECT column_value FROM TABLE(:roles))",
+                    users=_array_bind(self.connection, NUM_ARRAY_TYPE, user_ids.values()),
+                    roles=_array_bind(self.connection, NUM_ARRAY_TYPE, valid_roles)
+                )
+                existing = set(cursor)
+
+                pending = []
+                for user in users:
+                    user_id = user_ids.get(user)
+                    if user_id is None:
+                        continue
+                    for role_id in valid_roles:
+                        if (user_id, role_id) in existing:
+                            print(f"Info: Usuario '{user}' ya tiene el rol {role_id} ({self.role_name(role_id)})")
+                            result[user][role_id] = True
+                            continue
+                        existing.add((user_id, role_id))
+                        pending.append((user, role_id, user_id))
+
+                if not pending:
+                    return result
+
+                # Un solo parse y round-trip para todos los INSERT; los errores por fila
+                # (p.ej. FK) se juntan en getbatcherrors() en lugar de abortar el lote
+                cursor.executemany(
+                    "INSERT INTO ue21.ue_usuario_roles (id, rol_id, usr_id) "
+                    "VALUES (ue21.ue_usuario_roles_seq.NEXTVAL, :1, :2)",
+                    [(role_id, user_id) for _, role_id, user_id in pending],
+                    batcherrors=True
+                )
+                failed = set()
+                for error in cursor.getbatcherrors():
+                    user, role_id, _ = pending[error.offset]
+                    failed.add(error.offset)
+                    if 'ORA-00001' in error.message:
+                        # Otra sesion concedio el mismo par despues del SELECT de existentes
+                        print(f"Info: Usuario '{user}' ya tiene el rol {role_id} ({self.role_name(role_id)})")
+                        result[user][role_id] = True
+                    elif 'ORA-02291' in error.message:
+                        print(f"Error: ID de Rol {role_id} no existente (violacion de FK)", file=sys.stderr)
+                    else:
+                        print(f"Error de integridad de Oracle para '{user}' y rol {role_id}: {error.message}", file=sys.stderr)
+
+                if commit:
+                    self.connection.commit()
+
+                for offset, (user, role_id, _) in enumerate(pending):
+                    if offset in failed:
+                        continue
+                    result[user][role_id] = True
+                    if commit:
+                        self._report_grant(user, role_id)
+                    else:
+                        self._pending_grants.append((user, role_id))
+
+                return result
+
+        except oracledb.Error as e:
+            # Con commit=False la transaccion es del llamador: que la deshaga entera
+            if not commit:
+                raise
+            print(f"Error de Oracle: {e}", file=sys.stderr)
+            self.connection.rollback()
+            return result
+
+
+@functools.lru_cache(maxsize=1)
+def _read_db_config():
+    """Lee el .env y las variables de entorno una sola vez por proceso."""
     # Load .env file
     load_dotenv()
     
@@ -179,6 +470,12 @@ def load_db_config():
     return config
 
 
+def load_db_config():
+    """Carga configuracion desde variables de entorno."""
+    # Copia para que nadie modifique la config cacheada
+    return dict(_read_db_config())
+
+
 def connect_to_db(config: dict) -> oracledb.Connection:
     """Establece una conexion con OracleDB."""
     try:
@@ -216,20 +513,25 @@ def main():
                 print("Error: --user_name y --roles son requeridos para acciones check y grant", file=sys.stderr)
                 sys.exit(1)
             
-            roles = [int(role_id.strip()) for role_id in args.roles.split(',')]
-            users = [user.strip() for user in args.user_name.split(',')]
+            # dict.fromkeys quita repetidos manteniendo el orden, para no consultar dos veces lo mismo
+            roles = list(dict.fromkeys(int(role_id.strip()) for role_id in args.roles.split(',')))
+            users = list(dict.fromkeys(user.strip() for user in args.user_name.split(',')))
 
             if args.action == "grant":
-                for user in users:
-                    for role_id in roles:
-                        role_manager.grant_role(user, role_id)
+                # Un solo commit (y un solo flush del redo log) para todo el lote
+                role_manager.grant_roles_bulk(users, roles, commit=False)
+                role_manager.flush()
             elif args.action == "check":
-                for user in users:
-                    for role_id in roles:
-                        role_manager.check_user_role(user, role_id)
+                role_manager.check_user_roles_bulk(users, roles)
 
     except ValueError as e:
         print(f"Error: {e}", file=sys.stderr)
+        role_manager.rollback()
+        sys.exit(1)
+
+    except oracledb.Error as e:
+        print(f"Error de Oracle: {e}", file=sys.stderr)
+        role_manager.rollback()
         sys.exit(1)
 
     finally:
@@ -0,0 +1,71 @@
+import unittest
+from unittest import mock
+
+from rol_management import RoleManager
+
+
+class _StubCursor:
+    """Cursor minimo que devuelve filas fijas para SELECT id, nombre FROM ue_roles."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, *args, **kwargs):
+        pass
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class _StubConnection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self):
+        return _StubCursor(self.rows)
+
+
+class RoleLookupTest(unittest.TestCase):
+    def test_dense_ids_use_list(self):
+        manager = RoleManager(_StubConnection([(1, "Admin"), (3, "Alumno")]))
+
+        self.assertIsNotNone(manager._roles_arr)
+        self.assertTrue(manager.role_exists(1))
+        self.assertFalse(manager.role_exists(2))
+        self.assertFalse(manager.role_exists(99))
+        self.assertEqual(manager.role_name(3), "Alumno")
+        self.assertEqual(manager.role_name(2), "")
+
+    def test_sparse_ids_fall_back_to_dict(self):
+        manager = RoleManager(_StubConnection([(20001, "Admin"), (20002, "Alumno")]))
+
+        self.assertIsNone(manager._roles_arr)
+        self.assertTrue(manager.role_exists(20001))
+        self.assertFalse(manager.role_exists(1))
+        self.assertEqual(manager.role_name(20002), "Alumno")
+        self.assertEqual(manager.role_name(1), "")
+
+
+class UserIdCacheTest(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        manager = RoleManager(_StubConnection([]))
+
+        with mock.patch("rol_management.USER_ID_CACHE_MAX", 2):
+            manager._cache_user_id("ana", 1)
+            manager._cache_user_id("beto", 2)
+            self.assertEqual(manager._cached_user_id("ana"), 1)
+            manager._cache_user_id("carla", 3)
+
+        self.assertIsNone(manager._cached_user_id("beto"))
+        self.assertEqual(manager._cached_user_id("ana"), 1)
+        self.assertEqual(manager._cached_user_id("carla"), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()